@@ -3,20 +3,75 @@
 Database handler for saving Instagram profile data to PostgreSQL
 """
 
-import psycopg2
-from psycopg2.extras import execute_values
+import contextlib
+import csv
+import io
+import itertools
+import logging
+import operator
+import threading
 from datetime import datetime
 import os
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+# psycopg2 and python-dotenv are imported on first use, keeping them off
+# the scraper's start-up path
+
+logger = logging.getLogger(__name__)
+
+# Size of the chunks COPY reads from the staged CSV buffer
+COPY_CHUNK_SIZE = 64 * 1024
+
+# Rows fetched per round-trip when streaming profiles from a server-side cursor
+PROFILE_STREAM_SIZE = 2000
+
+# Suffixes that keep each server-side cursor name unique within a session
+_stream_ids = itertools.count(1)
+
+# Hot-path statements, kept as plain strings so psycopg2 sends them as-is
+UPSERT_SQL = "EXECUTE ig_upsert (%s, %s, %s, %s, %s);"
+
+COPY_STAGE_SQL = (
+    "COPY _stage (username, followers, following, posts_count, engagement) "
+    "FROM STDIN WITH (FORMAT CSV)"
+)
+
+MERGE_STAGE_SQL = """
+    INSERT INTO profiles (username, followers, following, posts_count, engagement, last_updated)
+    SELECT username, followers, following, posts_count, engagement, CURRENT_TIMESTAMP
+    FROM _stage
+    ON CONFLICT (username) 
+    DO UPDATE SET
+        followers = EXCLUDED.followers,
+        following = EXCLUDED.following,
+        posts_count = EXCLUDED.posts_count,
+        engagement = EXCLUDED.engagement,
+        last_updated = CURRENT_TIMESTAMP;
+"""
+
+# Pulls the stored counters out of a profile dictionary in one C-level call
+_profile_counts = operator.itemgetter('username', 'followers', 'following', 'posts_count')
 
 class DatabaseHandler:
+    # .env is read once, on first use rather than at import time
+    _env_loaded = False
+
+    # Connection pool shared by every handler in the process
+    _pool = None
+    _pool_lock = threading.Lock()
+    POOL_MIN_CONN = 1
+    POOL_MAX_CONN = 8
+
     def __init__(self):
         """Initialize database connection parameters"""
+        if not DatabaseHandler._env_loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            DatabaseHandler._env_loaded = True
+
         self.connection = None
         self.cursor = None
+        self._conn_pool = None
+        self._in_transaction = False
         self.db_config = {
             'host': os.getenv('DB_HOST', 'localhost'),
             'port': os.getenv('DB_PORT', 5432),
@@ -25,131 +80,274 @@ class DatabaseHandler:
             'database': os.getenv('DB_NAME', 'ig_leaderBoard')
         }
         
+    def __enter__(self):
+        """Acquire a pooled connection for the duration of a with-block"""
+        if not self.connect():
+            raise ConnectionError("Could not connect to PostgreSQL database")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Return the connection to the pool"""
+        self.disconnect()
+        return False
+
+    def _get_pool(self):
+        """Create the shared connection pool on first use"""
+        with DatabaseHandler._pool_lock:
+            if DatabaseHandler._pool is None:
+                import psycopg2.pool
+                DatabaseHandler._pool = psycopg2.pool.ThreadedConnectionPool(
+                    self.POOL_MIN_CONN,
+                    self.POOL_MAX_CONN,
+                    **self.db_config
+                )
+        return DatabaseHandler._pool
+
+    @classmethod
+    def close_pool(cls):
+        """Close every pooled connection (call once at process shutdown)"""
+        with cls._pool_lock:
+            if cls._pool is not None:
+                cls._pool.closeall()
+                cls._pool = None
+
     def connect(self):
-        """Establish connection to PostgreSQL database"""
+        """Acquire a connection to PostgreSQL from the shared pool"""
         try:
-            self.connection = psycopg2.connect(**self.db_config)
-            self.cursor = self.connection.cursor()
+            import psycopg2.extras
+            self._conn_pool = self._get_pool()
+            self.connection = self._conn_pool.getconn()
+            # Rows come back as dictionaries keyed by column name
+            self.cursor = self.connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            self._prepare_session()
             print("✅ Connected to PostgreSQL database")
             return True
         except Exception as e:
             print(f"❌ Database connection failed: {str(e)}")
+            self._discard_connection()
             return False
+
+    def _discard_connection(self):
+        """Drop a connection whose setup failed, closing it rather than pooling it"""
+        if self.cursor:
+            self.cursor.close()
+            self.cursor = None
+        if self.connection:
+            if self._conn_pool is not None and self._conn_pool is DatabaseHandler._pool:
+                self._conn_pool.putconn(self.connection, close=True)
+            else:
+                self.connection.close()
+            self.connection = None
+        self._conn_pool = None
     
+    def _prepare_session(self):
+        """
+        Set up per-connection state once, so the hot paths skip those round-trips
+
+        Creates the _stage table used by batch upserts and the server-side
+        prepared statement ig_upsert used by upsert_profile. Pooled
+        connections keep their session, so this is skipped on reuse.
+        """
+        self.cursor.execute(
+            "SELECT 1 FROM pg_prepared_statements WHERE name = 'ig_upsert';"
+        )
+        if self.cursor.fetchone() is None:
+            self.cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS _stage ON COMMIT DELETE ROWS AS
+                SELECT username, followers, following, posts_count, engagement
+                FROM profiles WITH NO DATA;
+
+                PREPARE ig_upsert AS
+                INSERT INTO profiles (username, followers, following, posts_count, engagement, last_updated)
+                VALUES ($1, $2, $3, $4, $5, CURRENT_TIMESTAMP)
+                ON CONFLICT (username) 
+                DO UPDATE SET
+                    followers = EXCLUDED.followers,
+                    following = EXCLUDED.following,
+                    posts_count = EXCLUDED.posts_count,
+                    engagement = EXCLUDED.engagement,
+                    last_updated = CURRENT_TIMESTAMP;
+            """)
+        self.connection.commit()
+
     def disconnect(self):
-        """Close database connection"""
+        """Release the database connection back to the pool"""
         if self.cursor:
             self.cursor.close()
+            self.cursor = None
         if self.connection:
-            self.connection.close()
-        print("🔌 Database connection closed")
+            if self._conn_pool is not None and self._conn_pool is DatabaseHandler._pool:
+                self._conn_pool.putconn(self.connection)
+            else:
+                # The pool was closed meanwhile; don't recreate it just to return this
+                self.connection.close()
+            self.connection = None
+            self._conn_pool = None
+        print("🔌 Database connection released")
     
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Group several upserts into one transaction
+
+        Commits once when the block exits (a single WAL flush instead of one
+        per profile) and rolls back if it raises:
+
+            with db.transaction():
+                for profile in profiles:
+                    db.upsert_profile(profile)
+
+        Both upsert_profile and upsert_profiles_batch join the open
+        transaction instead of committing on their own.
+        """
+        if self._in_transaction:
+            raise RuntimeError("Transaction already in progress")
+
+        # psycopg2 opens the transaction implicitly on the first statement
+        self._in_transaction = True
+        try:
+            yield self
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        finally:
+            self._in_transaction = False
+
     def upsert_profile(self, profile_data: dict):
         """
         Insert or update a single profile
+
+        Commits immediately unless called inside transaction().
         
         Args:
             profile_data: Dictionary with profile information
         """
         try:
-            # Add default engagement if not present
-            if 'engagement' not in profile_data:
-                profile_data['engagement'] = 0
-                
-            query = """
-                INSERT INTO profiles (username, followers, following, posts_count, engagement, last_updated)
-                VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
-                ON CONFLICT (username) 
-                DO UPDATE SET
-                    followers = EXCLUDED.followers,
-                    following = EXCLUDED.following,
-                    posts_count = EXCLUDED.posts_count,
-                    engagement = EXCLUDED.engagement,
-                    last_updated = CURRENT_TIMESTAMP
-                RETURNING username, followers, engagement;
-            """
-            
-            self.cursor.execute(query, (
+            # ig_upsert is prepared once per session in _prepare_session
+            self.cursor.execute(UPSERT_SQL, (
                 profile_data['username'],
                 profile_data['followers'],
                 profile_data['following'],
                 profile_data['posts_count'],
-                profile_data['engagement']
+                profile_data.get('engagement', 0)
             ))
             
-            result = self.cursor.fetchone()
-            self.connection.commit()
+            if not self._in_transaction:
+                self.connection.commit()
             
-            print(f"   💾 Saved to DB: @{result[0]} - {result[1]:,} followers, {result[2]}% engagement")
+            # Skip formatting the confirmation unless someone will see it
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"   💾 Saved to DB: @{profile_data['username']} - "
+                             f"{profile_data['followers']:,} followers, "
+                             f"{profile_data.get('engagement', 0)}% engagement")
             return True
             
         except Exception as e:
             print(f"   ❌ Error saving to database: {str(e)}")
+            if self._in_transaction:
+                # The transaction is aborted; let transaction() roll it back
+                raise
             self.connection.rollback()
             return False
     
     def upsert_profiles_batch(self, profiles_data: list):
         """
         Insert or update multiple profiles in batch
+
+        Commits immediately unless called inside transaction().
         
         Args:
             profiles_data: List of profile dictionaries
         """
+        # Engagement defaults to 0 when the scraper didn't compute it
+        rows = (
+            (*_profile_counts(profile), profile.get('engagement', 0))
+            for profile in profiles_data
+        )
+        return self._upsert_rows(rows, len(profiles_data))
+
+    def _upsert_rows(self, rows, count: int):
+        """
+        Bulk upsert (username, followers, following, posts_count, engagement) rows
+
+        Args:
+            rows: Iterable of row tuples
+            count: Number of rows, for reporting
+        """
         try:
-            query = """
-                INSERT INTO profiles (username, followers, following, posts_count, engagement)
-                VALUES %s
-                ON CONFLICT (username) 
-                DO UPDATE SET
-                    followers = EXCLUDED.followers,
-                    following = EXCLUDED.following,
-                    posts_count = EXCLUDED.posts_count,
-                    engagement = EXCLUDED.engagement,
-                    last_updated = CURRENT_TIMESTAMP;
-            """
-            
-            # Make sure all profiles have the engagement field (default to 0 if not present)
-            for profile in profiles_data:
-                if 'engagement' not in profile:
-                    profile['engagement'] = 0
-            
-            values = [
-                (
-                    profile['username'],
-                    profile['followers'],
-                    profile['following'],
-                    profile['posts_count'],
-                    profile['engagement']
-                )
-                for profile in profiles_data
-            ]
-            
-            execute_values(self.cursor, query, values)
-            self.connection.commit()
+            # Stage the rows with COPY (one round-trip, no per-row SQL parsing),
+            # then merge them into profiles in a single statement.
+            # _stage is created once per session and emptied on commit.
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+
+            # Rows are streamed straight into the buffer
+            writer.writerows(rows)
+            buf.seek(0)
+
+            self.cursor.copy_expert(COPY_STAGE_SQL, buf, size=COPY_CHUNK_SIZE)
+            self.cursor.execute(MERGE_STAGE_SQL)
+            if self._in_transaction:
+                # _stage is only emptied on commit; clear it for the next batch
+                self.cursor.execute("TRUNCATE _stage;")
+            else:
+                self.connection.commit()
             
-            print(f"\n✅ Batch saved {len(profiles_data)} profiles to database")
+            print(f"\n✅ Batch saved {count} profiles to database")
             return True
             
         except Exception as e:
             print(f"\n❌ Error in batch save: {str(e)}")
+            if self._in_transaction:
+                # The transaction is aborted; let transaction() roll it back
+                raise
             self.connection.rollback()
             return False
     
     def get_all_profiles(self):
-        """Retrieve all profiles from database"""
+        """
+        Stream all profiles from database
+
+        Uses a server-side cursor, so only PROFILE_STREAM_SIZE rows are held
+        in memory at a time. Call list() on the result if you need them all.
+        The cursor is declared WITH HOLD, so it survives commits made while
+        iterating (e.g. calling upsert_profile for each row).
+
+        Yields:
+            Profile dictionaries, most followers first
+
+        Raises:
+            Any database error that happens after the first row was yielded,
+            so a partial stream is never mistaken for the whole table, and
+            any error at all inside transaction()
+        """
+        import psycopg2.extras
+
+        streamed = False
         try:
             query = "SELECT * FROM profiles ORDER BY followers DESC;"
-            self.cursor.execute(query)
-            
-            columns = [desc[0] for desc in self.cursor.description]
-            results = self.cursor.fetchall()
-            
-            profiles = [dict(zip(columns, row)) for row in results]
-            return profiles
+            with self.connection.cursor(
+                name=f'profiles_stream_{next(_stream_ids)}',
+                cursor_factory=psycopg2.extras.RealDictCursor,
+                withhold=True
+            ) as cursor:
+                cursor.itersize = PROFILE_STREAM_SIZE
+                cursor.execute(query)
+                for row in cursor:
+                    streamed = True
+                    yield row
             
         except Exception as e:
+            if self._in_transaction:
+                # Rolling back here would discard the caller's open transaction;
+                # let transaction() roll it back instead
+                raise
+            if self.connection is not None and not self.connection.closed:
+                self.connection.rollback()
+            if streamed:
+                raise
             print(f"❌ Error fetching profiles: {str(e)}")
-            return []
     
     def get_profile_by_username(self, username: str):
         """Get a single profile by username"""
@@ -157,11 +355,7 @@ class DatabaseHandler:
             query = "SELECT * FROM profiles WHERE username = %s;"
             self.cursor.execute(query, (username,))
             
-            result = self.cursor.fetchone()
-            if result:
-                columns = [desc[0] for desc in self.cursor.description]
-                return dict(zip(columns, result))
-            return None
+            return self.cursor.fetchone()
             
         except Exception as e:
             print(f"❌ Error fetching profile: {str(e)}")
@@ -170,6 +364,7 @@ class DatabaseHandler:
 
 # Test the database handler
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format='%(message)s')
     print("Testing Database Handler...")
     
     db = DatabaseHandler()
@@ -189,13 +384,15 @@ if __name__ == "__main__":
         
         # Test: Retrieve all profiles
         print("\n📊 Fetching all profiles from database...")
-        profiles = db.get_all_profiles()
-        print(f"Total profiles in database: {len(profiles)}")
-        
-        for profile in profiles[:5]:  # Show first 5
-            print(f"  • @{profile['username']}: {profile['followers']:,} followers")
+        total = 0
+        for profile in db.get_all_profiles():
+            if total < 5:  # Show first 5
+                print(f"  • @{profile['username']}: {profile['followers']:,} followers")
+            total += 1
+        print(f"Total profiles in database: {total}")
         
         db.disconnect()
+        DatabaseHandler.close_pool()
         print("\n✅ Database handler test complete!")
     else:
         print("\n❌ Could not connect to database")
\ No newline at end of file
@@ -4,11 +4,46 @@ Instagram Profile Scraper
 Collects followers, following, posts count, and engagement metrics
 """
 
+import asyncio
+import functools
 import instaloader
+import logging
+import operator
+import os
+import random
 import sys
-import time
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Decorative per-profile output; set SCRAPER_VERBOSE=0 for large or scheduled runs
+VERBOSE = os.getenv('SCRAPER_VERBOSE', '1') != '0'
+
+# Maximum number of profiles fetched at the same time
+MAX_CONCURRENT_REQUESTS = 4
+
+# Upper bound (seconds) on the pause after Instagram starts rate limiting us
+MAX_BACKOFF = 60
+
+# Fields collected for every scraped profile
+PROFILE_FIELDS = ('username', 'followers', 'following', 'posts_count', 'scraped_at')
+_profile_fields = operator.itemgetter(*PROFILE_FIELDS)
+
+# Instagram web API endpoint returning just a profile's public info
+PROFILE_INFO_URL = "https://i.instagram.com/api/v1/users/web_profile_info/"
+
+# App id the Instagram web client sends; the endpoint rejects requests without it
+IG_APP_ID = '936619743392459'
+
+# Number of profile lookups kept in memory per scraper instance
+PROFILE_CACHE_SIZE = 128
+
+# Scraped profiles are flushed to the database in batches of up to this many...
+DB_BATCH_SIZE = 50
+
+# ...or once this many seconds have passed since the batch's first profile
+DB_FLUSH_INTERVAL = 2.0
 
 class InstagramScraper:
     def __init__(self):
@@ -25,7 +60,82 @@ class InstagramScraper:
             compress_json=False,
             quiet=True  # Suppress output
         )
-        
+
+        # Rate-limited fetches in a row; drives the backoff between requests
+        self._consecutive_errors = 0
+
+        # Memoize successful lookups; failures raise and are not cached
+        self._fetch_counts = functools.lru_cache(maxsize=PROFILE_CACHE_SIZE)(self._fetch_counts)
+
+    def _fetch_counts(self, username: str) -> Tuple[int, int, int]:
+        """
+        Fetch the followers, following and posts counters for a username
+
+        Queries the web_profile_info endpoint directly through Instaloader's
+        session (cookies, headers) instead of building a full Profile, so a
+        lookup is a single request with a small response.
+
+        Args:
+            username: Instagram username to look up
+
+        Returns:
+            Tuple of (followers, following, posts_count)
+        """
+        response = self.loader.context._session.get(
+            PROFILE_INFO_URL,
+            params={'username': username},
+            headers={'x-ig-app-id': IG_APP_ID},
+            timeout=self.loader.context.request_timeout,
+            allow_redirects=False
+        )
+
+        # Surface failures as Instaloader exceptions so callers handle them as
+        # before; login walls are mapped the same way Instaloader's get_json does
+        if response.is_redirect:
+            location = response.headers.get('location', '')
+            if 'accounts/login' in location or 'challenge' in location:
+                raise instaloader.exceptions.LoginRequiredException(
+                    f"Redirected to login page when fetching @{username}"
+                )
+            raise instaloader.exceptions.ConnectionException(
+                f"Unexpected redirect to {location} when fetching @{username}"
+            )
+        if response.status_code in (401, 403):
+            raise instaloader.exceptions.LoginRequiredException(
+                f"HTTP {response.status_code} when fetching @{username}"
+            )
+        if response.status_code == 404:
+            raise instaloader.exceptions.ProfileNotExistsException(
+                f"Profile {username} does not exist."
+            )
+        if response.status_code == 429:
+            raise instaloader.exceptions.TooManyRequestsException(
+                f"429 Too Many Requests when fetching @{username}"
+            )
+        if response.status_code != 200:
+            raise instaloader.exceptions.ConnectionException(
+                f"HTTP {response.status_code} when fetching @{username}"
+            )
+
+        try:
+            payload = response.json()
+        except ValueError:
+            raise instaloader.exceptions.ConnectionException(
+                f"Non-JSON response when fetching @{username}"
+            )
+
+        user = (payload.get('data') or {}).get('user')
+        if not user:
+            raise instaloader.exceptions.ProfileNotExistsException(
+                f"Profile {username} does not exist."
+            )
+
+        return (
+            user['edge_followed_by']['count'],
+            user['edge_follow']['count'],
+            user['edge_owner_to_timeline_media']['count']
+        )
+
     def get_profile_data(self, username: str) -> Optional[Dict]:
         """
         Scrape profile data for a given username
@@ -36,24 +146,19 @@ class InstagramScraper:
         Returns:
             Dictionary with profile metrics or None if failed
         """
+        # This runs in worker threads (see aget_profile_data), so report through
+        # logger, whose handlers serialize output, rather than print()
         try:
-            print(f"\n📊 Scraping profile: @{username}")
-            
-            # Load profile
-            profile = instaloader.Profile.from_username(
-                self.loader.context, 
-                username
-            )
+            logger.info("📊 Scraping profile: @%s", username)
             
             # Basic metrics
-            followers = profile.followers
-            following = profile.followees
-            posts_count = profile.mediacount
+            followers, following, posts_count = self._fetch_counts(username)
             
-            print(f"   Followers: {followers:,}")
-            print(f"   Following: {following:,}")
-            print(f"   Posts: {posts_count:,}")
+            # Deferred %-formatting: free when INFO is filtered out
+            logger.info("@%s followers=%d following=%d posts=%d",
+                        username, followers, following, posts_count)
             
+            self._consecutive_errors = 0
             return {
                 'username': username,
                 'followers': followers,
@@ -63,60 +168,217 @@ class InstagramScraper:
             }
             
         except instaloader.exceptions.ProfileNotExistsException:
-            print(f"❌ Profile @{username} does not exist")
-            return None
-        except instaloader.exceptions.PrivateProfileNotFollowedException:
-            print(f"❌ Profile @{username} is private")
+            logger.error("❌ Profile @%s does not exist", username)
             return None
         except instaloader.exceptions.LoginRequiredException:
-            print(f"⚠️  Login required to access @{username}")
+            # Instagram puts anonymous clients behind a login wall when throttling
+            self._consecutive_errors += 1
+            logger.warning("⚠️  Login required to access @%s", username)
+            return None
+        except instaloader.exceptions.ConnectionException as e:
+            if isinstance(e, instaloader.exceptions.TooManyRequestsException) or '429' in str(e):
+                self._consecutive_errors += 1
+                logger.warning("⚠️  Rate limited while scraping @%s", username)
+            else:
+                logger.error("❌ Error scraping @%s: %s", username, e)
             return None
         except Exception as e:
-            print(f"❌ Error scraping @{username}: {str(e)}")
+            logger.error("❌ Error scraping @%s: %s", username, e)
             return None
     
 
     
-    def scrape_multiple_profiles(self, usernames: List[str]) -> List[Dict]:
+    def _backoff_delay(self) -> float:
         """
-        Scrape multiple Instagram profiles
-        
+        Pause before the next request: a short jitter while requests succeed,
+        exponential backoff (capped at MAX_BACKOFF) while rate limited
+        """
+        if self._consecutive_errors == 0:
+            return 0.2 + random.random() * 0.3
+        return min(MAX_BACKOFF, 2 ** self._consecutive_errors + random.random())
+
+    async def aget_profile_data(self, username: str) -> Optional[Dict]:
+        """
+        Async variant of get_profile_data
+
+        Instaloader is synchronous, so the blocking fetch runs in a worker thread.
+
+        Args:
+            username: Instagram username to scrape
+
+        Returns:
+            Dictionary with profile metrics or None if failed
+        """
+        return await asyncio.to_thread(self.get_profile_data, username)
+
+    async def ascrape_multiple_profiles(self, usernames: List[str],
+                                        max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+                                        queue: Optional[asyncio.Queue] = None) -> Dict[str, List]:
+        """
+        Scrape multiple Instagram profiles concurrently
+
         Args:
             usernames: List of Instagram usernames
-            
+            max_concurrency: Maximum number of profiles fetched at once
+            queue: Optional queue that receives each profile dictionary as
+                   soon as it is scraped (e.g. for db_writer)
+
         Returns:
-            List of profile data dictionaries
+            Column-oriented results: a dictionary mapping each field in
+            PROFILE_FIELDS to a list of values, one per scraped profile
+            (in input order)
         """
-        results = []
         total = len(usernames)
-        
+        sem = asyncio.Semaphore(max_concurrency)
+
         print(f"\n{'='*60}")
-        print(f"🚀 Starting scrape for {total} profiles")
+        print(f"🚀 Starting scrape for {total} profiles ({max_concurrency} at a time)")
         print(f"{'='*60}")
-        
-        for idx, username in enumerate(usernames, 1):
-            print(f"\n[{idx}/{total}] Processing @{username}")
-            
-            data = self.get_profile_data(username)
-            
-            if data:
-                results.append(data)
-                print(f"✅ Success!")
-            else:
-                print(f"❌ Failed!")
-            
-            # Rate limiting: wait between requests
-            if idx < total:
-                wait_time = 3  # seconds
-                print(f"   ⏳ Waiting {wait_time}s before next profile...")
-                time.sleep(wait_time)
-        
+
+        # Per-profile output shares stdout with the worker threads, so it goes
+        # through logger too; a bare print() could land mid-line
+        async def scrape_one(idx: int, username: str) -> Optional[Dict]:
+            async with sem:
+                logger.info("[%d/%d] Processing @%s", idx, total, username)
+
+                data = await self.aget_profile_data(username)
+
+                if data:
+                    logger.info("✅ Success! (@%s)", username)
+                    if queue is not None:
+                        await queue.put(data)
+                else:
+                    logger.warning("❌ Failed! (@%s)", username)
+
+                # Rate limiting: hold the slot while backing off
+                await asyncio.sleep(self._backoff_delay())
+                return data
+
+        scraped = await asyncio.gather(
+            *(scrape_one(idx, username) for idx, username in enumerate(usernames, 1))
+        )
+
+        # Transpose the successful records into columns in C (itemgetter + zip)
+        results = {field: [] for field in PROFILE_FIELDS}
+        records = map(_profile_fields, filter(None, scraped))
+        results.update(zip(PROFILE_FIELDS, map(list, zip(*records))))
+
         print(f"\n{'='*60}")
-        print(f"✅ Scraping complete! Successfully scraped {len(results)}/{total} profiles")
+        print(f"✅ Scraping complete! Successfully scraped {len(results['username'])}/{total} profiles")
         print(f"{'='*60}\n")
-        
+
         return results
 
+    def scrape_multiple_profiles(self, usernames: List[str]) -> Dict[str, List]:
+        """
+        Scrape multiple Instagram profiles (blocking wrapper)
+
+        Args:
+            usernames: List of Instagram usernames
+
+        Returns:
+            Column-oriented results, see ascrape_multiple_profiles
+        """
+        return asyncio.run(self.ascrape_multiple_profiles(usernames))
+
+
+async def drain_queue(queue: asyncio.Queue, max_items: int,
+                      max_wait: float) -> Tuple[List[Dict], bool]:
+    """
+    Collect a batch of items from a queue
+
+    Waits for the first item, then keeps collecting until max_items are
+    gathered or max_wait seconds have passed.
+
+    Args:
+        queue: Queue to read from; None is the end-of-stream sentinel
+        max_items: Maximum batch size
+        max_wait: Maximum seconds to wait after the first item
+
+    Returns:
+        Tuple of (batch, done) where done is True once the sentinel was read
+    """
+    batch = []
+    item = await queue.get()
+    if item is None:
+        return batch, True
+    batch.append(item)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_wait
+    while len(batch) < max_items:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            item = await asyncio.wait_for(queue.get(), timeout)
+        except asyncio.TimeoutError:
+            break
+        if item is None:
+            return batch, True
+        batch.append(item)
+
+    return batch, False
+
+
+async def db_writer(queue: asyncio.Queue, db) -> int:
+    """
+    Background task saving scraped profiles to the database in batches
+
+    Runs until it reads the None sentinel, flushing whatever is left first.
+    The blocking database call runs in a worker thread so scraping continues
+    meanwhile.
+
+    Args:
+        queue: Queue of profile dictionaries
+        db: Connected DatabaseHandler
+
+    Returns:
+        Number of profiles saved
+    """
+    saved = 0
+    done = False
+    while not done:
+        batch, done = await drain_queue(queue, DB_BATCH_SIZE, DB_FLUSH_INTERVAL)
+        # Our scraper doesn't calculate engagement; the handler defaults it to 0
+        if batch and await asyncio.to_thread(db.upsert_profiles_batch, batch):
+            saved += len(batch)
+    return saved
+
+
+async def scrape_and_save(scraper: InstagramScraper, usernames: List[str]) -> Dict[str, List]:
+    """
+    Scrape profiles while saving them to the database in the background
+
+    Args:
+        scraper: Scraper to use
+        usernames: List of Instagram usernames
+
+    Returns:
+        Column-oriented results, see InstagramScraper.ascrape_multiple_profiles
+    """
+    from db_handler import DatabaseHandler
+
+    db = DatabaseHandler()
+    if not db.connect():
+        print("\n❌ Could not save to database")
+        DatabaseHandler.close_pool()
+        return await scraper.ascrape_multiple_profiles(usernames)
+
+    # Bounded, so a slow database applies back-pressure to the scrapers
+    queue = asyncio.Queue(maxsize=DB_BATCH_SIZE * 2)
+    writer = asyncio.create_task(db_writer(queue, db))
+    try:
+        results = await scraper.ascrape_multiple_profiles(usernames, queue=queue)
+    finally:
+        await queue.put(None)
+        saved = await writer
+        db.disconnect()
+        DatabaseHandler.close_pool()
+
+    print(f"💾 Saved {saved}/{len(results['username'])} profiles to PostgreSQL")
+    return results
+
 
 def main():
     """Main execution function"""
@@ -145,69 +407,64 @@ def main():
     # Initialize scraper
     scraper = InstagramScraper()
     
-    # Scrape all profiles
-    results = scraper.scrape_multiple_profiles(TARGET_PROFILES)
+    # Scrape all profiles, saving them to the database as they come in
+    results = asyncio.run(scrape_and_save(scraper, TARGET_PROFILES))
     
-    # Display results in a formatted table
-    if results:
-        print("\n" + "="*70)
-        print("📊 SCRAPING RESULTS:")
-        print("="*70)
-        print(f"{'Username':<20} {'Followers':<15} {'Following':<12} {'Posts':<10}")
-        print("-"*70)
-        
-        for data in results:
-            print(f"{data['username']:<20} {data['followers']:<15,} "
-                  f"{data['following']:<12,} {data['posts_count']:<10,}")
-        
-        print("="*90)
+    usernames = results['username']
+    followers = results['followers']
+    following = results['following']
+    posts = results['posts_count']
+
+    if usernames:
+        # Display results in a formatted table
+        if VERBOSE:
+            print("\n" + "="*70)
+            print("📊 SCRAPING RESULTS:")
+            print("="*70)
+            print(f"{'Username':<20} {'Followers':<15} {'Following':<12} {'Posts':<10}")
+            print("-"*70)
+            
+            for row in zip(usernames, followers, following, posts):
+                print(f"{row[0]:<20} {row[1]:<15,} {row[2]:<12,} {row[3]:<10,}")
+            
+            print("="*90)
         
-        # Calculate summary statistics
-        total_followers = sum(d['followers'] for d in results)
-        total_posts = sum(d['posts_count'] for d in results)
+        # Calculate summary statistics on contiguous int64 arrays
+        # (NumPy is imported here to keep it off the start-up path)
+        import numpy as np
+
+        followers_arr = np.fromiter(followers, dtype=np.int64, count=len(followers))
+        posts_arr = np.fromiter(posts, dtype=np.int64, count=len(posts))
+        top_followers = int(followers_arr.argmax())
+        top_posts = int(posts_arr.argmax())
         
         print(f"\n📈 Summary:")
-        print(f"   Total Profiles Scraped: {len(results)}")
-        print(f"   Total Combined Followers: {total_followers:,}")
-        print(f"   Total Combined Posts: {total_posts:,}")
-        print(f"   Most Followers: {max(results, key=lambda x: x['followers'])['username']} "
-              f"({max(d['followers'] for d in results):,})")
-        print(f"   Most Posts: {max(results, key=lambda x: x['posts_count'])['username']} "
-              f"({max(d['posts_count'] for d in results):,})")
+        print(f"   Total Profiles Scraped: {len(usernames)}")
+        print(f"   Total Combined Followers: {int(followers_arr.sum()):,}")
+        print(f"   Total Combined Posts: {int(posts_arr.sum()):,}")
+        print(f"   Most Followers: {usernames[top_followers]} ({followers[top_followers]:,})")
+        print(f"   Most Posts: {usernames[top_posts]} ({posts[top_posts]:,})")
         print("="*70 + "\n")
         
         return results
     else:
         print("❌ No data collected")
-        return []
+        return results
 
 
 if __name__ == "__main__":
+    # Log to stdout: the Node scheduler reports anything on stderr as a warning
+    logging.basicConfig(
+        level=logging.INFO if VERBOSE else logging.WARNING,
+        format='   %(message)s',
+        stream=sys.stdout
+    )
+
     try:
         results = main()
         
-        # Save to database if we have results
-        if results:
-            print("\n" + "="*70)
-            print("💾 SAVING TO DATABASE...")
-            print("="*70)
-            
-            from db_handler import DatabaseHandler
-            
-            db = DatabaseHandler()
-            if db.connect():
-                # Since our scraper doesn't calculate engagement, we need to add it
-                for profile in results:
-                    profile['engagement'] = 0  # Set default engagement to 0
-                
-                db.upsert_profiles_batch(results)
-                db.disconnect()
-                print("\n✅ All data saved to PostgreSQL!")
-            else:
-                print("\n❌ Could not save to database")
-        
         # Exit with success code if we got data
-        sys.exit(0 if results else 1)
+        sys.exit(0 if results['username'] else 1)
         
     except KeyboardInterrupt:
         print("\n\n⚠️  Scraping interrupted by user")